@@ -5,6 +5,7 @@ Platform web-based untuk membantu UKM dan business owners menghitung HPP/COGS
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import datetime
 import os
 import sys
@@ -13,7 +14,9 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from utils.calculations import calculate_all, get_top_contributors, validate_ingredients
-from utils.formatters import format_currency, format_percentage, format_gap, format_unit_options
+from utils.formatters import (
+    format_currency, format_currency_array, format_percentage, format_gap, format_unit_options
+)
 from utils.export import create_excel_report, create_import_template, parse_import_file
 from database.db import init_db, get_setting, set_setting
 
@@ -25,17 +28,39 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Load custom CSS
-def load_css():
+# Load custom CSS (isi file dibaca sekali, lalu di-cache)
+@st.cache_data(show_spinner=False)
+def read_css():
     css_path = os.path.join(os.path.dirname(__file__), "styles", "main.css")
     if os.path.exists(css_path):
         with open(css_path) as f:
-            st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+            return f.read()
+    return ""
+
+def load_css():
+    css = read_css()
+    if css:
+        st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
 
 load_css()
 
-# Initialize database
-init_db()
+# Initialize database (sekali per proses, bukan di setiap rerun)
+@st.cache_resource(show_spinner=False)
+def init_database():
+    return init_db()
+
+init_database()
+
+# Dtype kolom tabel bahan, ditetapkan sejak awal agar perkalian subtotal
+# tetap di jalur NumPy tanpa koersi ulang di setiap edit
+INGREDIENT_DTYPES = {
+    'Nama_Barang': 'str',
+    'Qty_Bahan': 'float64',
+    'Satuan': 'str',
+    'Qty_Jumlah': 'int64',
+    'Harga': 'float64',
+    'Subtotal': 'int64',
+}
 
 # Initialize session state with default values
 def init_session_state():
@@ -47,8 +72,9 @@ def init_session_state():
             'Qty_Jumlah': [0, 0, 0, 0, 0],
             'Harga': [0, 0, 0, 0, 0],
             'Subtotal': [0, 0, 0, 0, 0]
-        }),
+        }).astype(INGREDIENT_DTYPES),
         'calculation_result': None,
+        'calculation_key': None,
         'output_units': 50,
         'target_margin': float(get_setting('default_margin', '40')),
         'actual_price': 0.0,
@@ -64,6 +90,41 @@ def init_session_state():
 init_session_state()
 
 
+def subtotal_values(df):
+    """Nilai Subtotal (Qty_Jumlah × Harga, dibulatkan) untuk baris-baris di df."""
+    # Kolom sudah numerik (INGREDIENT_DTYPES); sel kosong hasil edit dianggap 0
+    qty = df['Qty_Jumlah'].to_numpy(dtype=np.float64, na_value=0)
+    harga = df['Harga'].to_numpy(dtype=np.float64, na_value=0)
+    return np.rint(qty * harga).astype(np.int64)
+
+
+# Function untuk menghitung subtotal sederhana
+def calculate_subtotals(df):
+    """
+    Hitung subtotal untuk setiap baris.
+    Formula: Subtotal = Qty_Jumlah × Harga
+
+    Qty_Bahan dan Satuan hanya untuk referensi, tidak mempengaruhi kalkulasi subtotal.
+    Kolom Subtotal diisi langsung pada df (tanpa copy); df yang sama dikembalikan.
+    """
+    df['Subtotal'] = subtotal_values(df)
+    return df
+
+
+# Laporan Excel di-cache per kunci perhitungan, nama produk, simbol mata uang dan
+# tanggal laporan (per menit, sama dengan yang tertulis di sheet Summary).
+# _calculation_result tidak di-hash; kuncinya sudah mewakili isi hasil.
+# Cache dipakai bersama semua sesi, jadi jumlah dan umur entrinya dibatasi.
+@st.cache_data(show_spinner=False, max_entries=32, ttl=3600)
+def cached_excel_report(calculation_key, product_name, currency_symbol, report_date, _calculation_result):
+    return create_excel_report(
+        calculation_result=_calculation_result,
+        product_name=product_name,
+        currency_symbol=currency_symbol,
+        report_date=report_date
+    )
+
+
 # ===== SIDEBAR =====
 with st.sidebar:
     st.markdown("### ⚙️ Settings")
@@ -136,24 +197,17 @@ with st.sidebar:
             })
 
             # Calculate subtotals: Qty_Jumlah × Harga
-            new_df['Subtotal'] = new_df.apply(
-                lambda row: round(float(row['Qty_Jumlah'] or 0) * float(row['Harga'] or 0), 0),
-                axis=1
-            )
+            new_df = calculate_subtotals(new_df)
 
             # Reorder columns
             new_df = new_df[['Nama_Barang', 'Qty_Bahan', 'Satuan', 'Qty_Jumlah', 'Harga', 'Subtotal']]
 
-            # Add empty rows
-            empty_rows = pd.DataFrame({
-                'Nama_Barang': [''] * 2,
-                'Qty_Bahan': [0.0] * 2,
-                'Satuan': ['pcs'] * 2,
-                'Qty_Jumlah': [0] * 2,
-                'Harga': [0] * 2,
-                'Subtotal': [0] * 2
-            })
-            st.session_state.ingredients_df = pd.concat([new_df, empty_rows], ignore_index=True)
+            # Add 2 empty rows: perbesar index lalu isi default per kolom
+            n_imported = len(new_df)
+            new_df = new_df.reindex(range(n_imported + 2))
+            new_df.iloc[n_imported:] = ['', 0.0, 'pcs', 0, 0, 0]
+            # reindex mengubah kolom integer menjadi float (NaN), kembalikan
+            st.session_state.ingredients_df = new_df.astype(INGREDIENT_DTYPES)
             st.success(f"✅ {len(ingredients)} bahan berhasil diimport!")
             st.rerun()
 
@@ -174,23 +228,6 @@ st.markdown(
 # Editable data table
 unit_options = format_unit_options()
 
-# Function untuk menghitung subtotal sederhana
-def calculate_subtotals(df):
-    """
-    Hitung subtotal untuk setiap baris.
-    Formula: Subtotal = Qty_Jumlah × Harga
-
-    Qty_Bahan dan Satuan hanya untuk referensi, tidak mempengaruhi kalkulasi subtotal.
-    """
-    df = df.copy()
-    df['Subtotal'] = df.apply(
-        lambda row: round(
-            float(row['Qty_Jumlah'] or 0) * float(row['Harga'] or 0), 0
-        ),
-        axis=1
-    )
-    return df
-
 # Callback untuk update ingredients saat data berubah
 def on_ingredients_change():
     """Sync editor state ke ingredients_df dan hitung subtotal"""
@@ -200,6 +237,10 @@ def on_ingredients_change():
 
         # Kolom yang tidak boleh diedit manual (calculated fields)
         readonly_cols = ['Subtotal']
+        # Kolom yang mempengaruhi Subtotal
+        subtotal_cols = ('Qty_Jumlah', 'Harga')
+        # Baris yang subtotalnya perlu dihitung ulang
+        changed_rows = set()
 
         # Apply edited rows
         if "edited_rows" in editor_state:
@@ -207,31 +248,39 @@ def on_ingredients_change():
                 for col, val in changes.items():
                     if col not in readonly_cols:
                         df.at[int(row_idx), col] = val
+                        if col in subtotal_cols:
+                            changed_rows.add(int(row_idx))
 
         # Apply added rows
         if "added_rows" in editor_state and editor_state["added_rows"]:
+            new_rows = []
             for new_row in editor_state["added_rows"]:
                 # Fill defaults for missing columns
-                complete_row = {
+                new_rows.append({
                     'Nama_Barang': new_row.get('Nama_Barang', ''),
                     'Qty_Bahan': new_row.get('Qty_Bahan', 0.0),
                     'Satuan': new_row.get('Satuan', 'pcs'),
                     'Qty_Jumlah': new_row.get('Qty_Jumlah', 0),
                     'Harga': new_row.get('Harga', 0),
                     'Subtotal': 0
-                }
-                df = pd.concat([df, pd.DataFrame([complete_row])], ignore_index=True)
+                })
+            # Satu kali concat untuk semua baris baru
+            df = pd.concat([df, pd.DataFrame(new_rows)], ignore_index=True)
+            changed_rows.update(range(len(df) - len(new_rows), len(df)))
+
+        # Recalculate subtotals (Qty_Jumlah × Harga) hanya untuk baris yang berubah
+        if changed_rows:
+            rows = sorted(changed_rows)
+            df.loc[rows, 'Subtotal'] = subtotal_values(df.loc[rows])
 
         # Apply deleted rows
         if "deleted_rows" in editor_state and editor_state["deleted_rows"]:
             df = df.drop(index=editor_state["deleted_rows"]).reset_index(drop=True)
 
-        # Recalculate subtotals: Qty_Jumlah × Harga
-        df = calculate_subtotals(df)
         st.session_state.ingredients_df = df
 
-# Pastikan subtotal dihitung sebelum display
-st.session_state.ingredients_df = calculate_subtotals(st.session_state.ingredients_df)
+# Subtotal tidak dihitung ulang setiap rerun: nilai awal, import file dan
+# on_ingredients_change sudah selalu mengisinya untuk baris yang berubah
 
 # Tooltip penjelasan formula
 st.caption("💡 **Subtotal** = Qty Jumlah × Harga (Qty Bahan & Satuan hanya untuk referensi)")
@@ -352,24 +401,42 @@ st.markdown("")
 
 # Calculate button
 if st.button("🧮 Hitung HPP & Harga Jual", type="primary"):
-    # Prepare ingredients data dari session state
-    ingredients = []
-    for _, row in st.session_state.ingredients_df.iterrows():
-        if row['Nama_Barang'] and str(row['Nama_Barang']).strip():
-            qty_bahan = float(row['Qty_Bahan']) if pd.notna(row['Qty_Bahan']) else 0
-            qty_jumlah = int(row['Qty_Jumlah']) if pd.notna(row['Qty_Jumlah']) else 0
-            harga = float(row['Harga']) if pd.notna(row['Harga']) else 0
-
-            # Total bahan = Qty_Bahan × Qty_Jumlah (untuk perhitungan HPP)
-            total_bahan = qty_bahan * qty_jumlah if qty_jumlah > 0 else qty_bahan
-
-            ingredients.append({
-                'name': str(row['Nama_Barang']).strip(),
-                'quantity': total_bahan,  # Total bahan yang dipakai
-                'unit': str(row['Satuan']) if pd.notna(row['Satuan']) else 'pcs',
-                # price_per_unit = Harga / Qty_Bahan untuk per satuan bahan
-                'price_per_unit': harga / qty_bahan if qty_bahan > 0 else harga
-            })
+    # Prepare ingredients data dari session state (per kolom, bukan per baris).
+    # Sel kosong diisi default sekali di awal, sehingga tidak perlu cek NaN per nilai.
+    df = st.session_state.ingredients_df.fillna({
+        'Nama_Barang': '',
+        'Qty_Bahan': 0,
+        'Satuan': 'pcs',
+        'Qty_Jumlah': 0,
+        'Harga': 0
+    })
+    names = df['Nama_Barang'].astype(str).str.strip().to_numpy()
+    qty_bahan = df['Qty_Bahan'].to_numpy(dtype=np.float64)
+    qty_jumlah = df['Qty_Jumlah'].to_numpy(dtype=np.float64).astype(np.int64)
+    harga = df['Harga'].to_numpy(dtype=np.float64)
+    satuan = df['Satuan'].astype(str).to_numpy()
+
+    # Total bahan = Qty_Bahan × Qty_Jumlah (untuk perhitungan HPP)
+    total_bahan = np.where(qty_jumlah > 0, qty_bahan * qty_jumlah, qty_bahan)
+    # price_per_unit = Harga / Qty_Bahan untuk per satuan bahan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        price_per_unit = np.where(qty_bahan > 0, harga / qty_bahan, harga)
+
+    mask = names != ''
+    ingredients = [
+        {
+            'name': name,
+            'quantity': quantity,  # Total bahan yang dipakai
+            'unit': unit,
+            'price_per_unit': price
+        }
+        for name, quantity, unit, price in zip(
+            names[mask].tolist(),
+            total_bahan[mask].tolist(),
+            satuan[mask].tolist(),
+            price_per_unit[mask].tolist()
+        )
+    ]
 
     # Validate
     is_valid, errors = validate_ingredients(ingredients)
@@ -378,17 +445,32 @@ if st.button("🧮 Hitung HPP & Harga Jual", type="primary"):
         for error in errors:
             st.error(error)
     else:
-        # Calculate
-        result = calculate_all(
-            ingredients=ingredients,
-            output_units=st.session_state.output_units,
-            target_margin_percent=st.session_state.target_margin,
-            actual_selling_price=st.session_state.actual_price if st.session_state.actual_price > 0 else None,
-            operational_cost=st.session_state.operational_cost,
-            other_cost=st.session_state.other_cost
+        actual_selling_price = st.session_state.actual_price if st.session_state.actual_price > 0 else None
+
+        # Kunci dari semua input (tuple-nya sendiri, bukan hash(), agar tidak bisa
+        # bertabrakan); jika sama dengan perhitungan terakhir, pakai hasil yang ada
+        calculation_key = (
+            tuple((ing['name'], ing['quantity'], ing['unit'], ing['price_per_unit']) for ing in ingredients),
+            st.session_state.output_units,
+            st.session_state.target_margin,
+            actual_selling_price,
+            st.session_state.operational_cost,
+            st.session_state.other_cost
         )
-        st.session_state.calculation_result = result
-        st.rerun()
+
+        if calculation_key != st.session_state.calculation_key or st.session_state.calculation_result is None:
+            # Calculate
+            result = calculate_all(
+                ingredients=ingredients,
+                output_units=st.session_state.output_units,
+                target_margin_percent=st.session_state.target_margin,
+                actual_selling_price=actual_selling_price,
+                operational_cost=st.session_state.operational_cost,
+                other_cost=st.session_state.other_cost
+            )
+            st.session_state.calculation_result = result
+            st.session_state.calculation_key = calculation_key
+            st.rerun()
 
 # Show info if no calculation yet
 if st.session_state.calculation_result is None:
@@ -480,19 +562,19 @@ if st.session_state.calculation_result is not None:
     # ===== Detail Perhitungan per Bahan =====
     st.markdown("### 🔍 Detail Perhitungan per Bahan")
 
-    # Create detail DataFrame
-    detail_data = []
-    for ing in result['ingredients']:
-        detail_data.append({
-            'Bahan': ing['name'],
-            'Qty per batch': ing['quantity'],
-            'Unit': ing['unit'],
-            'Harga per unit': format_currency(ing['price_per_unit'], currency),
-            'Total biaya': format_currency(ing['line_cost'], currency),
-            'Kontribusi ke total HPP': f"{ing['contribution_percent']:.1f}%"
-        })
-
-    detail_df = pd.DataFrame(detail_data)
+    # Create detail DataFrame: records hasil dikonversi sekali oleh pandas, lalu per kolom
+    result_df = pd.DataFrame.from_records(
+        result['ingredients'],
+        columns=['name', 'quantity', 'unit', 'price_per_unit', 'line_cost', 'contribution_percent']
+    )
+    detail_df = pd.DataFrame({
+        'Bahan': result_df['name'],
+        'Qty per batch': result_df['quantity'].astype(np.float64),
+        'Unit': result_df['unit'],
+        'Harga per unit': format_currency_array(result_df['price_per_unit'], currency),
+        'Total biaya': format_currency_array(result_df['line_cost'], currency),
+        'Kontribusi ke total HPP': result_df['contribution_percent'].map('{:.1f}%'.format)
+    })
     st.dataframe(detail_df, use_container_width=True, hide_index=True)
 
     st.divider()
@@ -502,27 +584,34 @@ if st.session_state.calculation_result is not None:
 
     top_contributors = get_top_contributors(result['ingredients'], 3)
 
-    for ing in top_contributors:
-        st.markdown(
-            f"• **{ing['name']}**: {format_currency(ing['line_cost'], currency)} "
-            f"({ing['contribution_percent']:.1f}% dari total biaya)"
-        )
+    # Satu blok markdown; "  \n" = line break markdown antar kontributor
+    contributor_lines = [
+        f"• **{ing['name']}**: {format_currency(ing['line_cost'], currency)} "
+        f"({ing['contribution_percent']:.1f}% dari total biaya)"
+        for ing in top_contributors
+    ]
+    if contributor_lines:
+        st.markdown("  \n".join(contributor_lines))
 
     st.divider()
 
     # ===== Export ke Excel =====
     st.markdown("### 📥 Export ke Excel")
 
-    excel_bytes = create_excel_report(
-        calculation_result=result,
+    # Satu waktu untuk isi laporan dan nama file, agar keduanya selalu cocok
+    report_time = datetime.now()
+    excel_bytes = cached_excel_report(
+        calculation_key=st.session_state.calculation_key,
         product_name="Produk",
-        currency_symbol=currency
+        currency_symbol=currency,
+        report_date=report_time.replace(second=0, microsecond=0),
+        _calculation_result=result
     )
 
     st.download_button(
         label="📋 Download HPP report (Excel)",
         data=excel_bytes,
-        file_name=f"hpp_calculation_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+        file_name=f"hpp_calculation_report_{report_time.strftime('%Y%m%d_%H%M%S')}.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
     )
 
@@ -1,33 +1,205 @@
+import atexit
+import json
 import sqlite3
 import os
+import threading
 from contextlib import contextmanager
+from functools import lru_cache
 
 DATABASE_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'hpp_calculator.db')
 
+# Per-connection tuning; journal_mode=WAL is persisted in the file by init_db()
+CONNECTION_PRAGMAS = """
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-65536;
+    PRAGMA mmap_size=268435456;
+    PRAGMA foreign_keys=ON;
+"""
+
 
 def ensure_data_dir():
     """Ensure the data directory exists."""
-    data_dir = os.path.dirname(DATABASE_PATH)
-    if not os.path.exists(data_dir):
-        os.makedirs(data_dir)
+    os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
 
 
-@contextmanager
-def get_connection():
-    """Get database connection as context manager."""
+# Hot-path SQL kept as constants so the shared connection's statement cache
+# reuses the prepared statement instead of re-parsing it on every call
+_SQL_GET_SETTING = 'SELECT value FROM settings WHERE key = ?'
+_SQL_SET_SETTING = 'INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)'
+
+# Shared by init_db and the table rebuild in _migrate_template_json
+_SQL_CREATE_TEMPLATES = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        output_units INTEGER DEFAULT 1,
+        target_margin_percent REAL DEFAULT 40,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+_SQL_INSERT_TEMPLATE_INGREDIENT = '''
+    INSERT INTO template_ingredients (
+        template_id, name, quantity, unit, price_per_unit,
+        line_cost, contribution_percent, extra_json
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Ingredient keys stored in their own template_ingredients column, with the
+# Python type that reads back unchanged from it (TEXT -> str, REAL -> float)
+_TEMPLATE_INGREDIENT_TYPES = {
+    'name': str,
+    'quantity': float,
+    'unit': str,
+    'price_per_unit': float,
+    'line_cost': float,
+    'contribution_percent': float,
+}
+TEMPLATE_INGREDIENT_COLUMNS = tuple(_TEMPLATE_INGREDIENT_TYPES)
+_SQLITE_INT_RANGE = range(-2 ** 63, 2 ** 63)
+
+# ALTER TABLE ... DROP COLUMN needs SQLite 3.35+; older builds rebuild the table
+_HAS_DROP_COLUMN = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# One long-lived connection per process so the page cache stays warm;
+# the lock serialises access from Streamlit's script threads
+_connection = None
+_connection_lock = threading.RLock()
+
+
+def _open_connection():
+    """Open a tuned connection to DATABASE_PATH."""
     ensure_data_dir()
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False, isolation_level=None)
     conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-    finally:
-        conn.close()
+    conn.executescript(CONNECTION_PRAGMAS)
+    return conn
+
+
+def close_connection():
+    """Close the shared connection (re-opened on next use)."""
+    global _connection
+    with _connection_lock:
+        if _connection is not None:
+            _connection.close()
+            _connection = None
+
+
+atexit.register(close_connection)
+
+
+@contextmanager
+def get_connection():
+    """Get database connection as context manager.
+
+    Yields the shared connection while holding its lock; the connection is
+    not closed afterwards. It runs in autocommit mode (isolation_level=None);
+    callers that write several statements open their own BEGIN/COMMIT.
+    """
+    global _connection
+    with _connection_lock:
+        if _connection is None:
+            _connection = _open_connection()
+        yield _connection
+
+
+@contextmanager
+def transaction(conn, name: str = 'tx'):
+    """Run a block of statements in one transaction.
+
+    Opens BEGIN/COMMIT on an idle connection, or a SAVEPOINT when the
+    connection is already inside a transaction. Rolls back on error.
+    """
+    if conn.in_transaction:
+        conn.execute(f'SAVEPOINT {name}')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute(f'ROLLBACK TO {name}')
+            conn.execute(f'RELEASE {name}')
+            raise
+        conn.execute(f'RELEASE {name}')
+    else:
+        conn.execute('BEGIN')
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+
+def _column_value(value):
+    """Value to bind to a template_ingredients column (None if SQLite can't hold it)."""
+    if type(value) is int:
+        return value if value in _SQLITE_INT_RANGE else None
+    if type(value) is float or type(value) is str:
+        return value
+    return None
+
+
+def _template_ingredient_row(template_id: int, ing: dict) -> tuple:
+    """Build the template_ingredients parameters for one ingredient dict.
+
+    Ingredients read back like the old JSON blob did: the standard keys go
+    to their columns (for filtering), and every key whose value a column
+    can't return unchanged - other keys, explicit None, ints in REAL
+    columns, NaN - is also kept in extra_json, which get_template_by_id
+    applies on top. A missing name is stored as '' (name is NOT NULL).
+    """
+    extra = {
+        key: value
+        for key, value in ing.items()
+        if type(value) is not _TEMPLATE_INGREDIENT_TYPES.get(key) or value != value
+    }
+    columns = [_column_value(ing.get(col)) for col in TEMPLATE_INGREDIENT_COLUMNS]
+    if columns[0] is None:
+        columns[0] = ''
+    return (template_id, *columns, json.dumps(extra) if extra else None)
+
+
+def insert_template_ingredients(conn, items) -> None:
+    """Insert (template_id, ingredient dict) pairs into template_ingredients."""
+    conn.executemany(_SQL_INSERT_TEMPLATE_INGREDIENT, [
+        _template_ingredient_row(template_id, ing) for template_id, ing in items
+    ])
+
+
+def _migrate_template_json(conn):
+    """Move ingredients_json of older template tables into template_ingredients."""
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(templates)')}
+    if 'ingredients_json' not in columns:
+        return
+
+    with transaction(conn, 'migrate_templates'):
+        rows = conn.execute('SELECT id, ingredients_json FROM templates').fetchall()
+
+        # Drop the column before adding child rows: the rebuild below drops
+        # the old table, which would cascade to rows already inserted
+        if _HAS_DROP_COLUMN:
+            conn.execute('ALTER TABLE templates DROP COLUMN ingredients_json')
+        else:
+            conn.execute(_SQL_CREATE_TEMPLATES.format(table='templates_new'))
+            conn.execute('''
+                INSERT INTO templates_new (id, name, output_units, target_margin_percent, created_at)
+                SELECT id, name, output_units, target_margin_percent, created_at FROM templates
+            ''')
+            conn.execute('DROP TABLE templates')
+            conn.execute('ALTER TABLE templates_new RENAME TO templates')
+
+        insert_template_ingredients(conn, (
+            (row['id'], ing)
+            for row in rows
+            for ing in json.loads(row['ingredients_json'])
+        ))
 
 
 def init_db():
     """Initialize database tables."""
-    ensure_data_dir()
     with get_connection() as conn:
+        # WAL is a property of the database file, so it only needs setting once
+        conn.execute('PRAGMA journal_mode=WAL')
+
         cursor = conn.cursor()
 
         # Calculations table
@@ -63,17 +235,26 @@ def init_db():
         ''')
 
         # Templates table
+        cursor.execute(_SQL_CREATE_TEMPLATES.format(table='templates'))
+
+        # Template ingredients table (one row per ingredient, like ingredients)
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS templates (
+            CREATE TABLE IF NOT EXISTS template_ingredients (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
+                template_id INTEGER NOT NULL,
                 name TEXT NOT NULL,
-                ingredients_json TEXT NOT NULL,
-                output_units INTEGER DEFAULT 1,
-                target_margin_percent REAL DEFAULT 40,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                quantity REAL,
+                unit TEXT,
+                price_per_unit REAL,
+                line_cost REAL,
+                contribution_percent REAL,
+                extra_json TEXT,
+                FOREIGN KEY (template_id) REFERENCES templates (id) ON DELETE CASCADE
             )
         ''')
 
+        _migrate_template_json(conn)
+
         # Settings table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS settings (
@@ -83,6 +264,21 @@ def init_db():
             )
         ''')
 
+        # Indexes for ingredient lookups/deletes and newest-first listings
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_ingredients_calc ON ingredients (calculation_id)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_calculations_created ON calculations (created_at DESC)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_templates_created ON templates (created_at DESC)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_template_ingredients_template
+            ON template_ingredients (template_id)
+        ''')
+
         # Insert default settings
         default_settings = [
             ('currency_symbol', 'Rp'),
@@ -91,21 +287,21 @@ def init_db():
             ('theme', 'light')
         ]
 
-        for key, value in default_settings:
-            cursor.execute('''
-                INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)
-            ''', (key, value))
+        cursor.executemany('''
+            INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)
+        ''', default_settings)
 
         conn.commit()
 
     return True
 
 
+@lru_cache(maxsize=128)
 def get_setting(key: str, default: str = None) -> str:
-    """Get a setting value by key."""
+    """Get a setting value by key (cached until the next set_setting)."""
     with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT value FROM settings WHERE key = ?', (key,))
+        cursor.execute(_SQL_GET_SETTING, (key,))
         row = cursor.fetchone()
         return row['value'] if row else default
 
@@ -114,7 +310,6 @@ def set_setting(key: str, value: str):
     """Set a setting value."""
     with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)
-        ''', (key, value))
+        cursor.execute(_SQL_SET_SETTING, (key, value))
         conn.commit()
+    get_setting.cache_clear()
@@ -1,7 +1,82 @@
 import json
+import sqlite3
 from datetime import datetime
 from typing import List, Dict, Optional
-from .db import get_connection
+from .db import (
+    TEMPLATE_INGREDIENT_COLUMNS,
+    get_connection,
+    insert_template_ingredients,
+    transaction,
+)
+
+# Static SQL, hoisted so the connection's statement cache can reuse it
+_SQL_INSERT_CALCULATION = '''
+    INSERT INTO calculations (
+        name, total_batch_cost, output_units, target_margin_percent,
+        hpp_per_unit, suggested_selling_price, actual_selling_price,
+        actual_margin_percent
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_SQL_INSERT_INGREDIENT = '''
+    INSERT INTO ingredients (
+        calculation_id, name, quantity, unit, price_per_unit,
+        line_cost, contribution_percent
+    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+_SQL_GET_CALCULATIONS = 'SELECT * FROM calculations ORDER BY created_at DESC LIMIT ?'
+_SQL_GET_CALCULATION_WITH_INGREDIENTS = '''
+    SELECT c.*,
+           i.id AS ing_id, i.calculation_id AS ing_calculation_id,
+           i.name AS ing_name, i.quantity AS ing_quantity, i.unit AS ing_unit,
+           i.price_per_unit AS ing_price_per_unit, i.line_cost AS ing_line_cost,
+           i.contribution_percent AS ing_contribution_percent
+    FROM calculations c
+    LEFT JOIN ingredients i ON i.calculation_id = c.id
+    WHERE c.id = ?
+    ORDER BY i.id
+'''
+_INGREDIENT_COLUMNS = (
+    'id', 'calculation_id', 'name', 'quantity', 'unit',
+    'price_per_unit', 'line_cost', 'contribution_percent'
+)
+_SQL_DELETE_CALCULATION = 'DELETE FROM calculations WHERE id = ?'
+_SQL_INSERT_TEMPLATE = '''
+    INSERT INTO templates (name, output_units, target_margin_percent)
+    VALUES (?, ?, ?)
+'''
+_SQL_GET_TEMPLATES = '''
+    SELECT t.id, t.name, t.output_units, t.target_margin_percent, t.created_at,
+           COUNT(i.id) AS ingredient_count
+    FROM templates t
+    LEFT JOIN template_ingredients i ON i.template_id = t.id
+    GROUP BY t.id
+    ORDER BY t.created_at DESC
+'''
+_SQL_GET_TEMPLATE_WITH_INGREDIENTS = '''
+    SELECT t.*,
+           i.id AS ing_id, i.name AS ing_name, i.quantity AS ing_quantity,
+           i.unit AS ing_unit, i.price_per_unit AS ing_price_per_unit,
+           i.line_cost AS ing_line_cost,
+           i.contribution_percent AS ing_contribution_percent,
+           i.extra_json AS ing_extra_json
+    FROM templates t
+    LEFT JOIN template_ingredients i ON i.template_id = t.id
+    WHERE t.id = ?
+    ORDER BY i.id
+'''
+_SQL_DELETE_TEMPLATE = 'DELETE FROM templates WHERE id = ?'
+
+# INSERT ... RETURNING needs SQLite 3.35+; older builds fall back to lastrowid
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+def _insert_returning_id(cursor: sqlite3.Cursor, sql: str, params) -> int:
+    """Run an INSERT and return the new row id."""
+    if _HAS_RETURNING:
+        cursor.execute(sql + ' RETURNING id', params)
+        return cursor.fetchone()[0]
+    cursor.execute(sql, params)
+    return cursor.lastrowid
 
 
 def save_calculation(
@@ -16,32 +91,19 @@ def save_calculation(
     actual_margin_percent: float = None
 ) -> int:
     """Save a calculation with its ingredients to database."""
-    with get_connection() as conn:
+    with get_connection() as conn, transaction(conn, 'save_calc'):
         cursor = conn.cursor()
 
         # Insert calculation
-        cursor.execute('''
-            INSERT INTO calculations (
-                name, total_batch_cost, output_units, target_margin_percent,
-                hpp_per_unit, suggested_selling_price, actual_selling_price,
-                actual_margin_percent
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        calculation_id = _insert_returning_id(cursor, _SQL_INSERT_CALCULATION, (
             name, total_batch_cost, output_units, target_margin_percent,
             hpp_per_unit, suggested_selling_price, actual_selling_price,
             actual_margin_percent
         ))
 
-        calculation_id = cursor.lastrowid
-
-        # Insert ingredients
-        for ing in ingredients:
-            cursor.execute('''
-                INSERT INTO ingredients (
-                    calculation_id, name, quantity, unit, price_per_unit,
-                    line_cost, contribution_percent
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
+        # Insert ingredients in one executemany within the same transaction
+        rows = [
+            (
                 calculation_id,
                 ing['name'],
                 ing['quantity'],
@@ -49,21 +111,24 @@ def save_calculation(
                 ing['price_per_unit'],
                 ing['line_cost'],
                 ing['contribution_percent']
-            ))
+            )
+            for ing in ingredients
+        ]
+        cursor.executemany(_SQL_INSERT_INGREDIENT, rows)
 
-        conn.commit()
         return calculation_id
 
 
-def get_calculations(limit: int = 50) -> List[Dict]:
-    """Get recent calculations."""
+def get_calculations(limit: int = 50) -> List[sqlite3.Row]:
+    """Get recent calculations.
+
+    Rows are returned as sqlite3.Row (row['name'], row.keys()); convert with
+    dict(row) only where a real dict is needed.
+    """
     with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM calculations ORDER BY created_at DESC LIMIT ?
-        ''', (limit,))
-        rows = cursor.fetchall()
-        return [dict(row) for row in rows]
+        cursor.execute(_SQL_GET_CALCULATIONS, (limit,))
+        return cursor.fetchall()
 
 
 def get_calculation_by_id(calculation_id: int) -> Optional[Dict]:
@@ -71,31 +136,28 @@ def get_calculation_by_id(calculation_id: int) -> Optional[Dict]:
     with get_connection() as conn:
         cursor = conn.cursor()
 
-        # Get calculation
-        cursor.execute('SELECT * FROM calculations WHERE id = ?', (calculation_id,))
-        calc_row = cursor.fetchone()
+        # Parent and ingredients in one query; parent columns repeat per row
+        cursor.execute(_SQL_GET_CALCULATION_WITH_INGREDIENTS, (calculation_id,))
+        rows = cursor.fetchall()
 
-        if not calc_row:
+        if not rows:
             return None
 
-        calculation = dict(calc_row)
-
-        # Get ingredients
-        cursor.execute('''
-            SELECT * FROM ingredients WHERE calculation_id = ?
-        ''', (calculation_id,))
-        ing_rows = cursor.fetchall()
-        calculation['ingredients'] = [dict(row) for row in ing_rows]
+        calculation = {k: rows[0][k] for k in rows[0].keys() if not k.startswith('ing_')}
+        calculation['ingredients'] = [
+            {col: row['ing_' + col] for col in _INGREDIENT_COLUMNS}
+            for row in rows
+            if row['ing_id'] is not None
+        ]
 
         return calculation
 
 
 def delete_calculation(calculation_id: int) -> bool:
-    """Delete a calculation and its ingredients."""
+    """Delete a calculation and its ingredients (via ON DELETE CASCADE)."""
     with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('DELETE FROM ingredients WHERE calculation_id = ?', (calculation_id,))
-        cursor.execute('DELETE FROM calculations WHERE id = ?', (calculation_id,))
+        cursor.execute(_SQL_DELETE_CALCULATION, (calculation_id,))
         conn.commit()
         return cursor.rowcount > 0
 
@@ -130,50 +192,67 @@ def update_calculation(calculation_id: int, **kwargs) -> bool:
 
 
 def save_template(name: str, ingredients: List[Dict], output_units: int = 1, target_margin_percent: float = 40) -> int:
-    """Save an ingredient template."""
-    with get_connection() as conn:
+    """Save an ingredient template.
+
+    Ingredient dicts are stored with all their keys and read back unchanged
+    by get_template_by_id, except that a missing 'name' reads back as ''.
+    """
+    with get_connection() as conn, transaction(conn, 'save_template'):
         cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO templates (name, ingredients_json, output_units, target_margin_percent)
-            VALUES (?, ?, ?, ?)
-        ''', (name, json.dumps(ingredients), output_units, target_margin_percent))
-        conn.commit()
-        return cursor.lastrowid
+        template_id = _insert_returning_id(
+            cursor, _SQL_INSERT_TEMPLATE, (name, output_units, target_margin_percent)
+        )
+
+        insert_template_ingredients(cursor, ((template_id, ing) for ing in ingredients))
+
+        return template_id
 
 
 def get_templates() -> List[Dict]:
-    """Get all templates."""
+    """Get all templates for listing.
+
+    Ingredients are not loaded here; only their count is returned as
+    'ingredient_count'. Use get_template_by_id for the full ingredient list.
+    """
     with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM templates ORDER BY created_at DESC')
+        cursor.execute(_SQL_GET_TEMPLATES)
         rows = cursor.fetchall()
-        templates = []
-        for row in rows:
-            template = dict(row)
-            template['ingredients'] = json.loads(template['ingredients_json'])
-            del template['ingredients_json']
-            templates.append(template)
-        return templates
+        return [dict(row) for row in rows]
 
 
 def get_template_by_id(template_id: int) -> Optional[Dict]:
-    """Get a template by ID."""
+    """Get a template with its ingredients by ID."""
     with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM templates WHERE id = ?', (template_id,))
-        row = cursor.fetchone()
-        if not row:
+        cursor.execute(_SQL_GET_TEMPLATE_WITH_INGREDIENTS, (template_id,))
+        rows = cursor.fetchall()
+        if not rows:
             return None
-        template = dict(row)
-        template['ingredients'] = json.loads(template['ingredients_json'])
-        del template['ingredients_json']
+
+        template = {k: rows[0][k] for k in rows[0].keys() if not k.startswith('ing_')}
+        # NULL columns are keys that were not given; extra_json restores the
+        # other keys and the values the typed columns can't return unchanged
+        ingredients = []
+        for row in rows:
+            if row['ing_id'] is None:
+                continue
+            ing = {
+                col: row['ing_' + col]
+                for col in TEMPLATE_INGREDIENT_COLUMNS
+                if row['ing_' + col] is not None
+            }
+            if row['ing_extra_json'] is not None:
+                ing.update(json.loads(row['ing_extra_json']))
+            ingredients.append(ing)
+        template['ingredients'] = ingredients
         return template
 
 
 def delete_template(template_id: int) -> bool:
-    """Delete a template."""
+    """Delete a template and its ingredients (via ON DELETE CASCADE)."""
     with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('DELETE FROM templates WHERE id = ?', (template_id,))
+        cursor.execute(_SQL_DELETE_TEMPLATE, (template_id,))
         conn.commit()
         return cursor.rowcount > 0
@@ -11,6 +11,7 @@ from .calculations import (
 
 from .formatters import (
     format_currency,
+    format_currency_array,
     format_percentage,
     format_number,
     parse_currency,
@@ -20,7 +21,9 @@ from .formatters import (
 from .export import (
     create_excel_report,
     create_import_template,
-    parse_import_file
+    parse_import_file,
+    write_excel_report,
+    write_import_template
 )
 
 __all__ = [
@@ -35,6 +38,7 @@ __all__ = [
     'get_top_contributors',
     # Formatters
     'format_currency',
+    'format_currency_array',
     'format_percentage',
     'format_number',
     'parse_currency',
@@ -42,5 +46,7 @@ __all__ = [
     # Export
     'create_excel_report',
     'create_import_template',
-    'parse_import_file'
+    'parse_import_file',
+    'write_excel_report',
+    'write_import_template'
 ]
@@ -11,8 +11,11 @@ Formulas:
 - Contribution % = (Line cost / Total batch cost) × 100
 """
 
+import heapq
+from dataclasses import dataclass, field
 from typing import List, Dict, Tuple
-from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
 
 
 def calculate_line_cost(quantity: float, price_per_unit: float) -> float:
@@ -91,6 +94,105 @@ def calculate_contribution_percent(line_cost: float, total_batch_cost: float) ->
     return round((line_cost / total_batch_cost) * 100, 2)
 
 
+# Below this many ingredients the scalar helpers beat NumPy's per-call overhead
+_VECTORIZE_MIN_INGREDIENTS = 32
+
+
+def _line_costs(quantities: np.ndarray, prices: np.ndarray) -> np.ndarray:
+    """Array version of calculate_line_cost (unrounded) for all ingredients at once."""
+    invalid = (quantities <= 0) | (prices <= 0)
+    return np.where(invalid, 0.0, quantities * prices)
+
+
+def _contribution_percents(line_costs: np.ndarray, total_batch_cost: float) -> np.ndarray:
+    """Array version of calculate_contribution_percent (unrounded) for all ingredients at once."""
+    if total_batch_cost <= 0:
+        return np.zeros_like(line_costs)
+    return (line_costs / total_batch_cost) * 100
+
+
+def _calculate_core(
+    quantities: np.ndarray,
+    prices: np.ndarray,
+    operational_cost: float,
+    other_cost: float
+) -> Tuple[List[float], List[float], float, float]:
+    """
+    Array core of calculate_all for long ingredient lists.
+
+    Returns (line_costs, contribution_percents, material_cost, total_batch_cost).
+    Rounding stays on Python floats: np.round is not correctly rounded
+    (e.g. 2.5 × 99.99 would become 249.98 instead of 249.97).
+    """
+    line_costs = [round(cost, 2) for cost in _line_costs(quantities, prices).tolist()]
+    material_cost = sum(line_costs, 0.0)
+    total_batch_cost = material_cost + operational_cost + other_cost
+    contributions = [
+        round(percent, 2)
+        for percent in _contribution_percents(np.array(line_costs), total_batch_cost).tolist()
+    ]
+    return line_costs, contributions, material_cost, total_batch_cost
+
+
+@dataclass
+class _IngredientBatch:
+    """
+    Named ingredients as parallel columns (struct-of-arrays).
+
+    Built once from the public list of dicts; line costs and contributions
+    are filled in by calculate_all and zipped back into dicts by to_dicts().
+    """
+    names: List[str] = field(default_factory=list)
+    units: List[str] = field(default_factory=list)
+    quantities: List[float] = field(default_factory=list)
+    prices: List[float] = field(default_factory=list)
+    line_costs: List[float] = field(default_factory=list)
+    contributions: List[float] = field(default_factory=list)
+
+    @classmethod
+    def from_dicts(cls, ingredients: List[Dict]) -> '_IngredientBatch':
+        """Collect named ingredients in a single pass."""
+        batch = cls()
+        for ing in ingredients:
+            name = ing.get('name', '').strip()
+            if name:
+                batch.names.append(name)
+                batch.quantities.append(float(ing.get('quantity', 0) or 0))
+                batch.units.append(ing.get('unit', 'unit'))
+                batch.prices.append(float(ing.get('price_per_unit', 0) or 0))
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def quantity_array(self) -> np.ndarray:
+        return np.fromiter(self.quantities, dtype=np.float64, count=len(self.quantities))
+
+    def price_array(self) -> np.ndarray:
+        return np.fromiter(self.prices, dtype=np.float64, count=len(self.prices))
+
+    def to_dicts(self) -> List[Dict]:
+        """Zip the columns back into the public ingredient dicts."""
+        return [
+            {
+                'name': name,
+                'quantity': quantity,
+                'unit': unit,
+                'price_per_unit': price_per_unit,
+                'line_cost': line_cost,
+                'contribution_percent': contribution
+            }
+            for name, quantity, unit, price_per_unit, line_cost, contribution in zip(
+                self.names,
+                self.quantities,
+                self.units,
+                self.prices,
+                self.line_costs,
+                self.contributions
+            )
+        ]
+
+
 def calculate_all(
     ingredients: List[Dict],
     output_units: int,
@@ -104,39 +206,36 @@ def calculate_all(
 
     Returns a dictionary with all calculated values.
     """
-    # Calculate line costs and total for ingredients
-    processed_ingredients = []
-    material_cost = 0.0
-
-    for ing in ingredients:
-        name = ing.get('name', '').strip()
-        if not name:
-            continue
-
-        quantity = float(ing.get('quantity', 0) or 0)
-        price_per_unit = float(ing.get('price_per_unit', 0) or 0)
-        unit = ing.get('unit', 'unit')
-
-        line_cost = calculate_line_cost(quantity, price_per_unit)
-        material_cost += line_cost
-
-        processed_ingredients.append({
-            'name': name,
-            'quantity': quantity,
-            'unit': unit,
-            'price_per_unit': price_per_unit,
-            'line_cost': line_cost,
-            'contribution_percent': 0  # Will be calculated after we have total
-        })
-
-    # Total batch cost = material + operational + other
-    total_batch_cost = material_cost + operational_cost + other_cost
-
-    # Calculate contribution percentages (based on total batch cost)
-    for ing in processed_ingredients:
-        ing['contribution_percent'] = calculate_contribution_percent(
-            ing['line_cost'], total_batch_cost
+    batch = _IngredientBatch.from_dicts(ingredients)
+
+    # Calculate line costs, totals and contribution percentages
+    if len(batch) >= _VECTORIZE_MIN_INGREDIENTS:
+        batch.line_costs, batch.contributions, material_cost, total_batch_cost = _calculate_core(
+            batch.quantity_array(),
+            batch.price_array(),
+            operational_cost,
+            other_cost
         )
+    else:
+        batch.line_costs = [
+            calculate_line_cost(q, p) for q, p in zip(batch.quantities, batch.prices)
+        ]
+        material_cost = sum(batch.line_costs, 0.0)
+
+        # Total batch cost = material + operational + other
+        total_batch_cost = material_cost + operational_cost + other_cost
+
+        # Same guard as calculate_contribution_percent and _contribution_percents
+        # (a NaN total is not <= 0), checked once instead of per ingredient
+        if total_batch_cost <= 0:
+            batch.contributions = [0.0] * len(batch)
+        else:
+            batch.contributions = [
+                round((line_cost / total_batch_cost) * 100, 2)
+                for line_cost in batch.line_costs
+            ]
+
+    processed_ingredients = batch.to_dicts()
 
     # Calculate operational and other cost contribution
     operational_contribution = calculate_contribution_percent(operational_cost, total_batch_cost)
@@ -195,15 +294,13 @@ def get_top_contributors(ingredients: List[Dict], top_n: int = 3) -> List[Dict]:
         if ing.get('name') and ing.get('line_cost', 0) > 0
     ]
 
-    # Sort by line cost descending
-    sorted_ingredients = sorted(
+    # Top N by line cost descending (same order as a full sort, ties included)
+    return heapq.nlargest(
+        top_n,
         valid_ingredients,
-        key=lambda x: x.get('line_cost', 0),
-        reverse=True
+        key=lambda x: x.get('line_cost', 0)
     )
 
-    return sorted_ingredients[:top_n]
-
 
 def validate_ingredients(ingredients: List[Dict]) -> Tuple[bool, List[str]]:
     """
@@ -212,36 +309,36 @@ def validate_ingredients(ingredients: List[Dict]) -> Tuple[bool, List[str]]:
     Returns (is_valid, error_messages).
     """
     errors = []
+    add_error = errors.append
     has_valid_ingredient = False
 
-    for i, ing in enumerate(ingredients):
-        row_num = i + 1
-        name = ing.get('name', '').strip()
+    for row_num, ing in enumerate(ingredients, 1):
+        get = ing.get
+        name = (get('name') or '').strip()
 
         # Skip empty rows
         if not name:
             continue
 
         has_valid_ingredient = True
+        quantity = get('quantity')
+        price = get('price_per_unit')
 
         # Validate name length
         if len(name) > 100:
-            errors.append(f"Baris {row_num}: Nama bahan terlalu panjang (max 100 karakter)")
+            add_error(f"Baris {row_num}: Nama bahan terlalu panjang (max 100 karakter)")
 
         # Validate quantity
-        quantity = ing.get('quantity')
         if quantity is None or quantity <= 0:
-            errors.append(f"Baris {row_num}: Kuantitas harus lebih dari 0")
+            add_error(f"Baris {row_num}: Kuantitas harus lebih dari 0")
 
         # Validate price
-        price = ing.get('price_per_unit')
         if price is None or price <= 0:
-            errors.append(f"Baris {row_num}: Harga per unit harus lebih dari 0")
+            add_error(f"Baris {row_num}: Harga per unit harus lebih dari 0")
 
         # Validate unit
-        unit = ing.get('unit', '').strip()
-        if not unit:
-            errors.append(f"Baris {row_num}: Satuan harus diisi")
+        if not (get('unit') or '').strip():
+            add_error(f"Baris {row_num}: Satuan harus diisi")
 
     if not has_valid_ingredient:
         errors.append("Minimal harus ada 1 bahan yang valid")
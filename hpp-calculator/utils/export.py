@@ -2,57 +2,150 @@
 Export utilities for Excel and PDF generation.
 """
 
+import csv
 import io
-import pandas as pd
+import numpy as np
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
-from openpyxl.utils.dataframe import dataframe_to_rows
+from functools import lru_cache
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, Border, Side, PatternFill, NamedStyle
+from openpyxl.styles.fonts import DEFAULT_FONT
+
+from .formatters import format_currency
+
+# Shared styles, built once and reused by every report/template cell
+_THIN_SIDE = Side(style='thin')
+_THIN_BORDER = Border(left=_THIN_SIDE, right=_THIN_SIDE, top=_THIN_SIDE, bottom=_THIN_SIDE)
+_TITLE_FONT = Font(bold=True, size=14)
+_HEADER_FONT = Font(bold=True, size=11)
+_BODY_FONT = Font(size=11)
+_DATE_FONT = Font(italic=True, size=10)
+_INFO_TITLE_FONT = Font(bold=True, size=12)
+_RIGHT_ALIGN = Alignment(horizontal='right')
+_CENTER_ALIGN = Alignment(horizontal='center')
+_REPORT_HEADER_FILL = PatternFill(start_color="F3F4F6", end_color="F3F4F6", fill_type="solid")
+_TEMPLATE_HEADER_FILL = PatternFill(start_color="E2E8F0", end_color="E2E8F0", fill_type="solid")
+_EXAMPLE_FILL = PatternFill(start_color="FEF3C7", end_color="FEF3C7", fill_type="solid")
+
+# Named style for ingredient data rows, registered per workbook (see _add_named_styles)
+_BORDERED_STYLE = 'bordered'
+
+
+def _add_named_styles(wb: Workbook) -> None:
+    """Register the workbook-level named styles used by the row loops."""
+    wb.add_named_style(NamedStyle(name=_BORDERED_STYLE, font=DEFAULT_FONT, border=_THIN_BORDER))
+
+
+def _cell(ws, value=None, font=None, fill=None, border=None, alignment=None, style=None) -> WriteOnlyCell:
+    """Build a styled cell for a write-only worksheet.
+
+    A named style is applied first in one assignment; the other arguments
+    override single attributes on top of it.
+    """
+    cell = WriteOnlyCell(ws, value=value)
+    if style is not None:
+        cell.style = style
+    if font is not None:
+        cell.font = font
+    if fill is not None:
+        cell.fill = fill
+    if border is not None:
+        cell.border = border
+    if alignment is not None:
+        cell.alignment = alignment
+    return cell
 
 
-def create_excel_report(
+def _append_row(ws, values, font=None, fill=None, border=None, alignment=None, style=None):
+    """Append one row to a write-only worksheet, applying the same style to every cell."""
+    ws.append([_cell(ws, value, font, fill, border, alignment, style) for value in values])
+
+
+# Column widths per sheet, applied before the first row (write-only mode)
+_SUMMARY_WIDTHS = (('A', 30), ('B', 25))
+_INGREDIENT_WIDTHS = (('A', 20), ('B', 12), ('C', 10), ('D', 15), ('E', 15), ('F', 12))
+_TEMPLATE_WIDTHS = (('A', 20), ('B', 12), ('C', 10), ('D', 12), ('E', 12))
+_INFO_WIDTHS = (('A', 70),)
+
+# Ingredient sheet layout shared by the Bahan and Analisis_Biaya sheets
+_INGREDIENT_HEADERS = ["Nama_Barang", "Qty_Total", "Satuan", "Harga_per_Unit", "Subtotal", "Kontribusi_%"]
+
+
+def _set_widths(ws, widths):
+    """Set column widths from (letter, width) pairs."""
+    for col, width in widths:
+        ws.column_dimensions[col].width = width
+
+
+def _write_ingredient_sheet(ws, ingredients: List[Dict], header_alignment=None):
+    """Write the ingredient table (header + one bordered row per ingredient).
+
+    The workbook must have the named styles from _add_named_styles.
+    """
+    # Adjust column widths
+    _set_widths(ws, _INGREDIENT_WIDTHS)
+
+    # Headers - Indonesian names
+    _append_row(
+        ws, _INGREDIENT_HEADERS, font=_HEADER_FONT, fill=_REPORT_HEADER_FILL,
+        border=_THIN_BORDER, alignment=header_alignment
+    )
+
+    # Data rows
+    for ing in ingredients:
+        _append_row(ws, [
+            ing['name'], ing['quantity'], ing['unit'],
+            ing['price_per_unit'], ing['line_cost'], ing['contribution_percent']
+        ], style=_BORDERED_STYLE)
+
+
+def write_excel_report(
+    out_stream: BinaryIO,
     calculation_result: Dict,
     product_name: str = "Produk",
-    currency_symbol: str = "Rp"
-) -> bytes:
+    currency_symbol: str = "Rp",
+    report_date: Optional[datetime] = None
+) -> None:
     """
-    Create Excel report with multiple sheets.
+    Write Excel report with multiple sheets to a binary stream.
 
     Sheets:
     1. Summary - Overview of calculation results
     2. Ingredients - Detailed ingredient breakdown
     3. Cost_breakdown - Cost analysis
 
-    Returns:
-        Excel file as bytes
+    The workbook is built in openpyxl write-only mode: rows are appended in
+    order and streamed to the file, column widths are set before the rows.
+
+    Args:
+        out_stream: Writable binary stream (file, response body, BytesIO)
+        report_date: Date shown on the Summary sheet (default: now)
     """
-    wb = Workbook()
-
-    # Styles
-    header_font = Font(bold=True, size=11)
-    header_fill = PatternFill(start_color="F3F4F6", end_color="F3F4F6", fill_type="solid")
-    title_font = Font(bold=True, size=14)
-    currency_font = Font(size=11)
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
+    if report_date is None:
+        report_date = datetime.now()
+
+    wb = Workbook(write_only=True)
+    _add_named_styles(wb)
 
     # ===== Sheet 1: Summary =====
-    ws_summary = wb.active
-    ws_summary.title = "Summary"
+    ws_summary = wb.create_sheet("Summary")
+
+    # Adjust column widths
+    _set_widths(ws_summary, _SUMMARY_WIDTHS)
 
     # Title
-    ws_summary['A1'] = f"Laporan HPP - {product_name}"
-    ws_summary['A1'].font = title_font
-    ws_summary.merge_cells('A1:D1')
+    ws_summary.append([_cell(ws_summary, f"Laporan HPP - {product_name}", font=_TITLE_FONT)])
+    ws_summary.merged_cells.add('A1:D1')
 
     # Date
-    ws_summary['A2'] = f"Tanggal: {datetime.now().strftime('%d/%m/%Y %H:%M')}"
-    ws_summary['A2'].font = Font(italic=True, size=10)
+    ws_summary.append([_cell(
+        ws_summary,
+        f"Tanggal: {report_date.strftime('%d/%m/%Y %H:%M')}",
+        font=_DATE_FONT
+    )])
+    ws_summary.append([])
 
     # Get cost breakdown values (with defaults for backwards compatibility)
     material_cost = calculation_result.get('material_cost', calculation_result['total_batch_cost'])
@@ -63,107 +156,69 @@ def create_excel_report(
     summary_data = [
         ["", ""],
         ["RINGKASAN PERHITUNGAN", ""],
-        ["Total Biaya per Batch", f"{currency_symbol} {calculation_result['total_batch_cost']:,.0f}".replace(",", ".")],
-        ["  - Biaya Bahan Baku", f"{currency_symbol} {material_cost:,.0f}".replace(",", ".")],
-        ["  - Biaya Operasional", f"{currency_symbol} {operational_cost:,.0f}".replace(",", ".")],
-        ["  - Biaya Lain-lain", f"{currency_symbol} {other_cost:,.0f}".replace(",", ".")],
+        ["Total Biaya per Batch", format_currency(calculation_result['total_batch_cost'], currency_symbol)],
+        ["  - Biaya Bahan Baku", format_currency(material_cost, currency_symbol)],
+        ["  - Biaya Operasional", format_currency(operational_cost, currency_symbol)],
+        ["  - Biaya Lain-lain", format_currency(other_cost, currency_symbol)],
         ["Jumlah Output (porsi/unit)", calculation_result['output_units']],
         ["Target Margin", f"{calculation_result['target_margin_percent']:.1f}%"],
         ["", ""],
         ["HASIL PERHITUNGAN", ""],
-        ["HPP per Porsi/Unit", f"{currency_symbol} {calculation_result['hpp_per_unit']:,.0f}".replace(",", ".")],
-        ["Harga Jual Disarankan", f"{currency_symbol} {calculation_result['suggested_selling_price']:,.0f}".replace(",", ".")],
+        ["HPP per Porsi/Unit", format_currency(calculation_result['hpp_per_unit'], currency_symbol)],
+        ["Harga Jual Disarankan", format_currency(calculation_result['suggested_selling_price'], currency_symbol)],
         ["", ""],
         ["ANALISIS MARGIN", ""],
-        ["Harga Jual Aktual", f"{currency_symbol} {calculation_result['actual_selling_price']:,.0f}".replace(",", ".")],
+        ["Harga Jual Aktual", format_currency(calculation_result['actual_selling_price'], currency_symbol)],
         ["Margin Aktual", f"{calculation_result['actual_margin_percent']:.1f}%"],
         ["Gap vs Target", f"{calculation_result['gap_vs_target']:+.1f} pp"],
     ]
 
-    for row_idx, row_data in enumerate(summary_data, start=4):
-        for col_idx, value in enumerate(row_data, start=1):
-            cell = ws_summary.cell(row=row_idx, column=col_idx, value=value)
-            if col_idx == 1 and value and value.isupper():
-                cell.font = header_font
-            elif col_idx == 1:
-                cell.font = Font(size=11)
-            else:
-                cell.font = currency_font
-                cell.alignment = Alignment(horizontal='right')
-
-    # Adjust column widths
-    ws_summary.column_dimensions['A'].width = 30
-    ws_summary.column_dimensions['B'].width = 25
+    for label, value in summary_data:
+        label_font = _HEADER_FONT if label and label.isupper() else _BODY_FONT
+        ws_summary.append([
+            _cell(ws_summary, label, font=label_font),
+            _cell(ws_summary, value, font=_BODY_FONT, alignment=_RIGHT_ALIGN),
+        ])
 
     # ===== Sheet 2: Bahan (Ingredients) =====
-    ws_ingredients = wb.create_sheet("Bahan")
-
-    # Headers - Indonesian names
-    headers = ["Nama_Barang", "Qty_Total", "Satuan", "Harga_per_Unit", "Subtotal", "Kontribusi_%"]
-    for col_idx, header in enumerate(headers, start=1):
-        cell = ws_ingredients.cell(row=1, column=col_idx, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = thin_border
-        cell.alignment = Alignment(horizontal='center')
-
-    # Data rows
-    for row_idx, ing in enumerate(calculation_result['ingredients'], start=2):
-        ws_ingredients.cell(row=row_idx, column=1, value=ing['name']).border = thin_border
-        ws_ingredients.cell(row=row_idx, column=2, value=ing['quantity']).border = thin_border
-        ws_ingredients.cell(row=row_idx, column=3, value=ing['unit']).border = thin_border
-        ws_ingredients.cell(row=row_idx, column=4, value=ing['price_per_unit']).border = thin_border
-        ws_ingredients.cell(row=row_idx, column=5, value=ing['line_cost']).border = thin_border
-        ws_ingredients.cell(row=row_idx, column=6, value=ing['contribution_percent']).border = thin_border
-
-    # Adjust column widths
-    ws_ingredients.column_dimensions['A'].width = 20
-    ws_ingredients.column_dimensions['B'].width = 12
-    ws_ingredients.column_dimensions['C'].width = 10
-    ws_ingredients.column_dimensions['D'].width = 15
-    ws_ingredients.column_dimensions['E'].width = 15
-    ws_ingredients.column_dimensions['F'].width = 12
+    _write_ingredient_sheet(
+        wb.create_sheet("Bahan"),
+        calculation_result['ingredients'],
+        header_alignment=_CENTER_ALIGN
+    )
 
     # ===== Sheet 3: Analisis Biaya (Cost Breakdown) =====
-    ws_cost = wb.create_sheet("Analisis_Biaya")
-
-    # Headers - Indonesian names (sorted by contribution)
-    cost_headers = ["Nama_Barang", "Qty_Total", "Satuan", "Harga_per_Unit", "Subtotal", "Kontribusi_%"]
-    for col_idx, header in enumerate(cost_headers, start=1):
-        cell = ws_cost.cell(row=1, column=col_idx, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = thin_border
-
-    # Sort by contribution (descending)
+    # Sorted by contribution (descending)
     sorted_ingredients = sorted(
         calculation_result['ingredients'],
         key=lambda x: x['contribution_percent'],
         reverse=True
     )
+    _write_ingredient_sheet(wb.create_sheet("Analisis_Biaya"), sorted_ingredients)
 
-    for row_idx, ing in enumerate(sorted_ingredients, start=2):
-        ws_cost.cell(row=row_idx, column=1, value=ing['name']).border = thin_border
-        ws_cost.cell(row=row_idx, column=2, value=ing['quantity']).border = thin_border
-        ws_cost.cell(row=row_idx, column=3, value=ing['unit']).border = thin_border
-        ws_cost.cell(row=row_idx, column=4, value=ing['price_per_unit']).border = thin_border
-        ws_cost.cell(row=row_idx, column=5, value=ing['line_cost']).border = thin_border
-        ws_cost.cell(row=row_idx, column=6, value=ing['contribution_percent']).border = thin_border
+    wb.save(out_stream)
 
-    # Adjust column widths
-    for col, width in [('A', 20), ('B', 12), ('C', 10), ('D', 15), ('E', 15), ('F', 12)]:
-        ws_cost.column_dimensions[col].width = width
 
-    # Save to bytes
+def create_excel_report(
+    calculation_result: Dict,
+    product_name: str = "Produk",
+    currency_symbol: str = "Rp",
+    report_date: Optional[datetime] = None
+) -> bytes:
+    """
+    Create Excel report with multiple sheets (see write_excel_report).
+
+    Returns:
+        Excel file as bytes
+    """
     output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
+    write_excel_report(output, calculation_result, product_name, currency_symbol, report_date)
     return output.getvalue()
 
 
-def create_import_template() -> bytes:
+def write_import_template(out_stream: BinaryIO) -> None:
     """
-    Create Excel template for batch import.
+    Write Excel template for batch import to a binary stream.
 
     Columns:
     - Nama_Barang (text): Nama bahan
@@ -172,32 +227,21 @@ def create_import_template() -> bytes:
     - Qty_Jumlah (number): Jumlah kemasan yang dibeli
     - Harga (number): Harga per kemasan
 
-    Returns:
-        Excel file as bytes
+    Args:
+        out_stream: Writable binary stream (file, response body, BytesIO)
     """
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Template"
-
-    # Styles
-    header_font = Font(bold=True, size=11)
-    header_fill = PatternFill(start_color="E2E8F0", end_color="E2E8F0", fill_type="solid")
-    example_fill = PatternFill(start_color="FEF3C7", end_color="FEF3C7", fill_type="solid")
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Template")
+
+    # Adjust column widths
+    _set_widths(ws, _TEMPLATE_WIDTHS)
 
     # Headers - new structure
     headers = ["Nama_Barang", "Qty_Bahan", "Satuan", "Qty_Jumlah", "Harga"]
-    for col_idx, header in enumerate(headers, start=1):
-        cell = ws.cell(row=1, column=col_idx, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = thin_border
-        cell.alignment = Alignment(horizontal='center')
+    _append_row(
+        ws, headers, font=_HEADER_FONT, fill=_TEMPLATE_HEADER_FILL,
+        border=_THIN_BORDER, alignment=_CENTER_ALIGN
+    )
 
     # Example data - Qty_Bahan (per kemasan), Satuan, Qty_Jumlah (jumlah kemasan), Harga (per kemasan)
     examples = [
@@ -209,19 +253,14 @@ def create_import_template() -> bytes:
         ["Gas LPG", 3, "kg", 1, 22000],                 # 3kg x 1 = Rp 22.000
     ]
 
-    for row_idx, row_data in enumerate(examples, start=2):
-        for col_idx, value in enumerate(row_data, start=1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=value)
-            cell.fill = example_fill
-            cell.border = thin_border
+    for row_data in examples:
+        _append_row(ws, row_data, fill=_EXAMPLE_FILL, border=_THIN_BORDER)
 
-    # Add empty rows for user input
-    for row_idx in range(8, 20):
-        for col_idx in range(1, 6):
-            ws.cell(row=row_idx, column=col_idx).border = thin_border
+    # User rows go below the examples on the sheet's own grid (no styled blank cells)
 
     # Instructions sheet
     ws_info = wb.create_sheet("Petunjuk")
+    _set_widths(ws_info, _INFO_WIDTHS)
     instructions = [
         ["PETUNJUK PENGGUNAAN TEMPLATE"],
         [""],
@@ -249,25 +288,155 @@ def create_import_template() -> bytes:
     ]
 
     for row_idx, row_data in enumerate(instructions, start=1):
-        cell = ws_info.cell(row=row_idx, column=1, value=row_data[0] if row_data else "")
+        value = row_data[0] if row_data else ""
         if row_idx == 1:
-            cell.font = Font(bold=True, size=12)
+            ws_info.append([_cell(ws_info, value, font=_INFO_TITLE_FONT)])
+        else:
+            ws_info.append([value])
 
-    # Adjust column widths
-    ws.column_dimensions['A'].width = 20
-    ws.column_dimensions['B'].width = 12
-    ws.column_dimensions['C'].width = 10
-    ws.column_dimensions['D'].width = 12
-    ws.column_dimensions['E'].width = 12
-    ws_info.column_dimensions['A'].width = 70
-
-    # Save to bytes
+    wb.save(out_stream)
+
+
+@lru_cache(maxsize=1)
+def create_import_template() -> bytes:
+    """
+    Create Excel template for batch import (see write_import_template).
+
+    The template is static, so it is built once and the same bytes are
+    returned on every later call.
+
+    Returns:
+        Excel file as bytes
+    """
     output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
+    write_import_template(output)
     return output.getvalue()
 
 
+# pandas.read_csv's default NA strings; such fields are read as missing values
+_CSV_NA_VALUES = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a',
+    'nan', 'null',
+})
+
+
+def _read_csv(
+    file_content: bytes, usecols: Optional[Callable[[str], bool]] = None
+) -> Tuple[List[str], List[list]]:
+    """
+    Read a CSV file into (columns, rows) of raw string values.
+
+    Tokenizes with the stdlib csv module (UTF-8, optional BOM) instead of
+    pd.read_csv; numeric columns are coerced later during validation. Like
+    read_csv, blank lines are skipped, short rows are padded and empty or
+    NA-like fields ('NA', 'N/A', 'null', ... see _CSV_NA_VALUES) become
+    NaN. When usecols is given, only columns whose header passes it are
+    kept.
+    """
+    reader = csv.reader(io.StringIO(file_content.decode('utf-8-sig'), newline=''))
+    header = next(reader, [])
+    keep = [i for i, name in enumerate(header) if usecols is None or usecols(name)]
+    width = len(header)
+    data = []
+    for row in reader:
+        if not row:
+            continue
+        if len(row) < width:
+            row = row + [''] * (width - len(row))
+        data.append([float('nan') if row[i] in _CSV_NA_VALUES else row[i] for i in keep])
+
+    return [header[i] for i in keep], data
+
+
+def _read_xlsx(
+    file_content: bytes, usecols: Optional[Callable[[str], bool]] = None
+) -> Tuple[List[str], List[list]]:
+    """
+    Read the first worksheet of an XLSX file into (columns, rows).
+
+    Uses openpyxl read-only mode and iter_rows(values_only=True), which
+    streams plain values instead of building a Cell object per cell.
+    When usecols is given, only columns whose header passes it are kept.
+    Rows shorter than the header (sheets without a <dimension> element are
+    not padded in read-only mode) get empty cells for the missing columns.
+    """
+    wb = load_workbook(io.BytesIO(file_content), read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = ['' if name is None else str(name) for name in next(rows, ())]
+        keep = [i for i, name in enumerate(header) if usecols is None or usecols(name)]
+        data = []
+        for row in rows:
+            width = len(row)
+            data.append([
+                float('nan') if i >= width or row[i] is None else row[i]
+                for i in keep
+            ])
+    finally:
+        wb.close()
+
+    return [header[i] for i in keep], data
+
+
+# Import validation messages by reason code (first failing rule per row)
+_IMPORT_ERRORS = {
+    1: "Qty Bahan tidak valid",
+    2: "Qty Bahan harus > 0",
+    3: "Satuan harus diisi",
+    4: "Qty Jumlah tidak valid",
+    5: "Qty Jumlah harus > 0",
+    6: "Harga tidak valid",
+    7: "Harga harus > 0",
+}
+
+
+# Map common column name variations - new structure
+_COLUMN_MAPPING = {
+    'nama_barang': ['nama_barang', 'ingredient', 'bahan', 'nama', 'nama_bahan', 'name'],
+    'qty_bahan': ['qty_bahan', 'qty_per_batch', 'quantity', 'qty', 'kuantitas'],
+    'satuan': ['satuan', 'unit', 'uom'],
+    'qty_jumlah': ['qty_jumlah', 'jumlah', 'jml', 'amount', 'qty_amount'],
+    'harga': ['harga', 'price', 'price_per_unit', 'harga_per_unit', 'harga_satuan']
+}
+# Flat alternative -> (target, priority); earlier alternatives win when a file has several
+_ALT_TO_TARGET = {
+    alt: (target, rank)
+    for target, alternatives in _COLUMN_MAPPING.items()
+    for rank, alt in enumerate(alternatives)
+}
+
+
+def _is_known_column(col) -> bool:
+    return str(col).strip().lower() in _ALT_TO_TARGET
+
+
+def _python_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def _numeric_column(series) -> np.ndarray:
+    """
+    Coerce an import column to float64 (NaN where it is not a number).
+
+    pd.to_numeric handles the bulk; the few non-empty values it rejects are
+    retried with float(), which also accepts what the old per-row parsing
+    did (e.g. '1_000', surrounding whitespace).
+    """
+    import pandas as pd
+
+    values = pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    retry = np.flatnonzero(np.isnan(values) & series.notna().to_numpy())
+    if retry.size:
+        raw = series.to_numpy()
+        values = values.copy()  # to_numpy may hand back a read-only view
+        values[retry] = [_python_float(raw[i]) for i in retry.tolist()]
+    return values
+
+
 def parse_import_file(file_content: bytes, filename: str) -> Tuple[List[Dict], List[str]]:
     """
     Parse uploaded Excel/CSV file with new column structure.
@@ -286,35 +455,39 @@ def parse_import_file(file_content: bytes, filename: str) -> Tuple[List[Dict], L
     Returns:
         Tuple of (ingredients_list, error_messages)
     """
+    # Deferred so exporting (and merely importing this module) never loads pandas
+    import pandas as pd
+
     errors = []
     ingredients = []
 
     try:
         # Determine file type
         if filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(file_content))
+            # stdlib csv tokenizer, mappable columns only
+            columns, data = _read_csv(file_content, usecols=_is_known_column)
+            df = pd.DataFrame(data, columns=columns)
+        elif filename.endswith('.xlsx'):
+            # openpyxl read-only/data-only, mappable columns only
+            columns, data = _read_xlsx(file_content, usecols=_is_known_column)
+            df = pd.DataFrame(data, columns=columns)
         else:
-            df = pd.read_excel(io.BytesIO(file_content))
+            df = pd.read_excel(io.BytesIO(file_content), usecols=_is_known_column)
 
         # Normalize column names
-        df.columns = df.columns.str.strip().str.lower()
-
-        # Map common column name variations - new structure
-        column_mapping = {
-            'nama_barang': ['nama_barang', 'ingredient', 'bahan', 'nama', 'nama_bahan', 'name'],
-            'qty_bahan': ['qty_bahan', 'qty_per_batch', 'quantity', 'qty', 'kuantitas'],
-            'satuan': ['satuan', 'unit', 'uom'],
-            'qty_jumlah': ['qty_jumlah', 'jumlah', 'jml', 'amount', 'qty_amount'],
-            'harga': ['harga', 'price', 'price_per_unit', 'harga_per_unit', 'harga_satuan']
-        }
-
-        # Find matching columns
+        df.columns = [str(col).strip().lower() for col in df.columns]
+        # Repeated headers: the first occurrence wins (read_csv used to rename
+        # later ones to 'col.1', which then matched nothing)
+        df = df.loc[:, ~df.columns.duplicated()]
+
+        # Find matching columns in one pass over the file's columns
         final_columns = {}
-        for target, alternatives in column_mapping.items():
-            for alt in alternatives:
-                if alt in df.columns:
-                    final_columns[target] = alt
-                    break
+        for col in df.columns:
+            if col in _ALT_TO_TARGET:
+                target, rank = _ALT_TO_TARGET[col]
+                current = final_columns.get(target)
+                if current is None or rank < _ALT_TO_TARGET[current][1]:
+                    final_columns[target] = col
 
         # Check required columns
         required = ['nama_barang', 'qty_bahan', 'satuan', 'qty_jumlah', 'harga']
@@ -327,59 +500,58 @@ def parse_import_file(file_content: bytes, filename: str) -> Tuple[List[Dict], L
         # Rename columns to standard names
         df = df.rename(columns={v: k for k, v in final_columns.items()})
 
-        # Process each row
-        for idx, row in df.iterrows():
-            row_num = idx + 2  # Account for header row and 0-index
-
-            ingredient_name = str(row.get('nama_barang', '')).strip()
-
-            # Skip empty rows
-            if not ingredient_name or ingredient_name.lower() == 'nan':
-                continue
-
-            # Validate and parse qty_bahan (quantity per package)
-            try:
-                qty_bahan = float(row.get('qty_bahan', 0))
-                if qty_bahan <= 0:
-                    errors.append(f"Baris {row_num}: Qty Bahan harus > 0")
-                    continue
-            except (ValueError, TypeError):
-                errors.append(f"Baris {row_num}: Qty Bahan tidak valid")
-                continue
-
-            # Validate unit
-            satuan = str(row.get('satuan', '')).strip()
-            if not satuan or satuan.lower() == 'nan':
-                errors.append(f"Baris {row_num}: Satuan harus diisi")
-                continue
-
-            # Validate and parse qty_jumlah (number of packages)
-            try:
-                qty_jumlah = int(float(row.get('qty_jumlah', 0)))
-                if qty_jumlah <= 0:
-                    errors.append(f"Baris {row_num}: Qty Jumlah harus > 0")
-                    continue
-            except (ValueError, TypeError):
-                errors.append(f"Baris {row_num}: Qty Jumlah tidak valid")
-                continue
-
-            # Validate and parse harga (price per package)
-            try:
-                harga = float(row.get('harga', 0))
-                if harga <= 0:
-                    errors.append(f"Baris {row_num}: Harga harus > 0")
-                    continue
-            except (ValueError, TypeError):
-                errors.append(f"Baris {row_num}: Harga tidak valid")
-                continue
-
-            ingredients.append({
-                'nama_barang': ingredient_name,
-                'qty_bahan': qty_bahan,
-                'satuan': satuan,
-                'qty_jumlah': qty_jumlah,
-                'harga': harga
-            })
+        # Vectorized validation: coerce every column once, then one mask per
+        # rule. Each row reports only its first failing rule, in the same
+        # order the checks were made row by row (qty_bahan, satuan, qty_jumlah, harga).
+        names = df['nama_barang'].map(str).str.strip()
+        units = df['satuan'].map(str).str.strip()
+        # Numeric rules run on plain float64 arrays (NaN = not a number)
+        qty_bahan, qty_jumlah_raw, harga = (
+            _numeric_column(df[col]) for col in ('qty_bahan', 'qty_jumlah', 'harga')
+        )
+
+        # qty_jumlah is truncated to int before its > 0 check
+        qty_jumlah_invalid = ~np.isfinite(qty_jumlah_raw)
+        qty_jumlah = np.trunc(np.where(qty_jumlah_invalid, 0.0, qty_jumlah_raw))
+
+        has_name = ((names != '') & (names.str.lower() != 'nan')).to_numpy()
+        conditions = [
+            np.isnan(qty_bahan),
+            qty_bahan <= 0,
+            ((units == '') | (units.str.lower() == 'nan')).to_numpy(),
+            qty_jumlah_invalid,
+            qty_jumlah <= 0,
+            np.isnan(harga),
+            harga <= 0,
+        ]
+        reason = np.select(conditions, range(1, len(conditions) + 1), default=0)
+        reason[~has_name] = -1  # empty rows are skipped silently
+
+        # Messages only for the failing rows, found with one C-level mask scan
+        failed = np.flatnonzero(reason > 0)
+        row_nums = df.index.to_numpy()[failed] + 2  # Account for header row and 0-index
+        errors.extend(
+            f"Baris {row_num}: {_IMPORT_ERRORS[code]}"
+            for row_num, code in zip(row_nums.tolist(), reason[failed].tolist())
+        )
+
+        valid = reason == 0
+        ingredients = [
+            {
+                'nama_barang': name,
+                'qty_bahan': qty,
+                'satuan': unit,
+                'qty_jumlah': int(jumlah),
+                'harga': price
+            }
+            for name, qty, unit, jumlah, price in zip(
+                names[valid].tolist(),
+                qty_bahan[valid].tolist(),
+                units[valid].tolist(),
+                qty_jumlah[valid].tolist(),
+                harga[valid].tolist()
+            )
+        ]
 
         if not ingredients and not errors:
             errors.append("Tidak ada data valid ditemukan dalam file")
@@ -4,7 +4,71 @@ Indonesian locale formatting.
 """
 
 import re
-from typing import Union
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+# Indonesian separators; every formatter table below is built from these
+_THOUSANDS = "."
+_DECIMAL = ","
+
+# One-pass separator swaps from Python's format output:
+# "1,234.5" -> "1.234,5" and "1,234" -> "1.234"
+_LOCALE_TABLE = str.maketrans({",": _THOUSANDS, ".": _DECIMAL})
+_THOUSANDS_TABLE = str.maketrans({",": _THOUSANDS})
+# Prebuilt ",.Nf" format specs for the usual decimal_places values
+_SEPARATOR_SPECS = {n: f",.{n}f" for n in range(7)}
+# Floats at or above this magnitude overflow format_currency_array's int64 cast
+_INT64_LIMIT = 2.0 ** 63
+
+# Currency symbol letters and whitespace stripped by parse_currency
+_CURRENCY_STRIP_RE = re.compile(r'[RrPp\s]')
+# Characters of an already-clean amount; such strings skip the regex
+_PLAIN_AMOUNT_CHARS = '0123456789.,-+'
+# Indonesian amounts to Python floats: drop thousand dots, decimal comma -> dot
+_STRIP_DOTS = str.maketrans('', '', _THOUSANDS)
+_COMMA_DECIMAL = str.maketrans({_THOUSANDS: None, _DECIMAL: '.'})
+
+# Common unit options, returned as-is by format_unit_options
+_UNIT_OPTIONS = (
+    "kg",
+    "gram",
+    "liter",
+    "ml",
+    "meter",
+    "cm",
+    "piece",
+    "pcs",
+    "pack",
+    "box",
+    "lusin",
+    "unit",
+    "porsi",
+    "buah",
+    "lembar",
+    "botol",
+    "kaleng",
+    "sachet",
+    "bungkus"
+)
+
+
+def _to_float(value) -> Optional[float]:
+    """Coerce a formatter input to a number, or None if it isn't one.
+
+    int and float pass through without a try block; anything else goes
+    through float().
+    """
+    if value is None:
+        return None
+    t = type(value)
+    if t is int or t is float:
+        return value
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
 
 
 def format_currency(
@@ -25,24 +89,71 @@ def format_currency(
     Returns:
         Formatted currency string, e.g., "Rp 1.234.567"
     """
+    # Plain ints (e.g. database amounts) need no float round-trip
+    if decimal_places == 0 and type(value) is int:
+        return f"{symbol} {format(value, ',').translate(_THOUSANDS_TABLE)}"
+
+    value = _to_float(value)
     if value is None:
         return f"{symbol} 0"
 
-    try:
-        value = float(value)
-    except (ValueError, TypeError):
-        return f"{symbol} 0"
+    # Bypass the cache for values it can't key: NaN != NaN, and 0.0 == -0.0
+    # would let the first zero decide the sign for both
+    if value != value or value == 0:
+        return _format_currency_float(value, symbol, decimal_places)
+
+    return _format_currency_cached(value, symbol, decimal_places)
 
+
+def _format_currency_float(value: float, symbol: str, decimal_places: int) -> str:
+    """Format an already-coerced float (see format_currency)."""
     # Round to specified decimal places
     if decimal_places == 0:
-        value = int(round(value))
-        formatted = f"{value:,}".replace(",", ".")
-    else:
-        formatted = f"{value:,.{decimal_places}f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        # Common case: one integer format with thousand separator
+        return f"{symbol} {format(round(value), ',').translate(_THOUSANDS_TABLE)}"
 
+    spec = _SEPARATOR_SPECS.get(decimal_places) or f",.{decimal_places}f"
+    formatted = format(value, spec).translate(_LOCALE_TABLE)
     return f"{symbol} {formatted}"
 
 
+# Recipes and reports repeat the same prices, so most calls are cache hits
+_format_currency_cached = lru_cache(maxsize=2048)(_format_currency_float)
+
+
+def format_currency_array(
+    values: Iterable[Union[int, float]],
+    symbol: str = "Rp"
+) -> List[str]:
+    """
+    Format a whole column of numbers as Indonesian currency (no decimals).
+
+    Gives the same result as calling format_currency on every finite value,
+    but rounds them in one NumPy pass and builds the symbol prefix once.
+    Finite values outside the int64 range are passed to format_currency
+    one by one. NaN and +/-inf have no amount and are shown as
+    "<symbol> 0" (format_currency raises for them).
+
+    Args:
+        values: Numbers to format (list, tuple, numpy array, pandas Series)
+        symbol: Currency symbol (default: "Rp")
+
+    Returns:
+        List of formatted strings, e.g., ["Rp 1.000", "Rp 25.500"]
+    """
+    array = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(array)
+    # Strict bound: 2**63 itself does not fit in int64
+    in_range = finite & (np.abs(array) < _INT64_LIMIT)
+    amounts = np.rint(np.where(in_range, array, 0.0)).astype(np.int64)
+
+    prefix = f"{symbol} "
+    formatted = [prefix + f"{amount:,}".translate(_THOUSANDS_TABLE) for amount in amounts.tolist()]
+    for i in np.flatnonzero(finite & ~in_range).tolist():
+        formatted[i] = format_currency(float(array[i]), symbol)
+    return formatted
+
+
 def format_percentage(
     value: Union[int, float],
     decimal_places: int = 1,
@@ -59,18 +170,13 @@ def format_percentage(
     Returns:
         Formatted percentage string, e.g., "40.0%"
     """
+    value = _to_float(value)
     if value is None:
         return "0%"
 
-    try:
-        value = float(value)
-    except (ValueError, TypeError):
-        return "0%"
-
-    if include_sign and value > 0:
-        return f"+{value:.{decimal_places}f}%"
-
-    return f"{value:.{decimal_places}f}%"
+    # '+' only for strictly positive values; zero and NaN stay unsigned
+    sign = "+" if include_sign and value > 0 else ""
+    return f"{value:{sign}.{decimal_places}f}%"
 
 
 def format_number(
@@ -89,22 +195,22 @@ def format_number(
     Returns:
         Formatted number string
     """
-    if value is None:
-        return "0"
+    if decimal_places == 0 and type(value) is int:
+        return format(value, ',').translate(_THOUSANDS_TABLE) if use_separator else str(value)
 
-    try:
-        value = float(value)
-    except (ValueError, TypeError):
+    value = _to_float(value)
+    if value is None:
         return "0"
 
     if decimal_places == 0:
-        value = int(round(value))
+        value = round(value)
         if use_separator:
-            return f"{value:,}".replace(",", ".")
+            return format(value, ',').translate(_THOUSANDS_TABLE)
         return str(value)
 
     if use_separator:
-        return f"{value:,.{decimal_places}f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        spec = _SEPARATOR_SPECS.get(decimal_places) or f",.{decimal_places}f"
+        return format(value, spec).translate(_LOCALE_TABLE)
 
     return f"{value:.{decimal_places}f}"
 
@@ -129,25 +235,29 @@ def parse_currency(value: str) -> float:
         return float(value)
 
     # Remove currency symbol and whitespace
-    cleaned = str(value).strip()
-    cleaned = re.sub(r'[Rp\s]', '', cleaned, flags=re.IGNORECASE)
+    cleaned = value.strip() if isinstance(value, str) else str(value).strip()
+    if cleaned.strip(_PLAIN_AMOUNT_CHARS):
+        cleaned = _CURRENCY_STRIP_RE.sub('', cleaned)
+
+    # Bare digits: no separators to interpret
+    if cleaned.isdecimal():
+        return float(cleaned)
 
     # Handle Indonesian format (dots as thousand separator)
     # Check if it looks like Indonesian format (has dots but no comma or single comma for decimals)
     if '.' in cleaned and ',' not in cleaned:
         # Could be Indonesian thousand separator or decimal point
         # If multiple dots, it's thousand separator
-        if cleaned.count('.') > 1:
-            cleaned = cleaned.replace('.', '')
+        dot_count = cleaned.count('.')
+        if dot_count > 1:
+            cleaned = cleaned.translate(_STRIP_DOTS)
         # If single dot with 3+ digits after, it's thousand separator
-        elif '.' in cleaned:
-            parts = cleaned.split('.')
-            if len(parts) == 2 and len(parts[1]) >= 3:
-                cleaned = cleaned.replace('.', '')
+        elif len(cleaned) - cleaned.rindex('.') - 1 >= 3:
+            cleaned = cleaned.translate(_STRIP_DOTS)
     elif ',' in cleaned:
         # Has comma - could be Indonesian decimal separator
         # Replace dots (thousand sep) and comma (decimal)
-        cleaned = cleaned.replace('.', '').replace(',', '.')
+        cleaned = cleaned.translate(_COMMA_DECIMAL)
 
     try:
         return float(cleaned)
@@ -176,50 +286,25 @@ def format_gap(value: float, decimal_places: int = 1) -> str:
     Returns:
         Formatted string like "+2.5 pp" or "-3.0 pp"
     """
+    value = _to_float(value)
     if value is None:
         return "0 pp"
 
-    try:
-        value = float(value)
-    except (ValueError, TypeError):
+    # Zero (and NaN) have no sign; the '+' spec signs everything else
+    if not (value > 0 or value < 0):
         return "0 pp"
 
-    if value > 0:
-        return f"+{value:.{decimal_places}f} pp"
-    elif value < 0:
-        return f"{value:.{decimal_places}f} pp"
-    else:
-        return "0 pp"
+    return f"{value:+.{decimal_places}f} pp"
 
 
-def format_unit_options() -> list:
+def format_unit_options() -> Tuple[str, ...]:
     """
     Get list of common unit options.
 
     Returns:
-        List of unit strings
-    """
-    return [
-        "kg",
-        "gram",
-        "liter",
-        "ml",
-        "meter",
-        "cm",
-        "piece",
-        "pcs",
-        "pack",
-        "box",
-        "lusin",
-        "unit",
-        "porsi",
-        "buah",
-        "lembar",
-        "botol",
-        "kaleng",
-        "sachet",
-        "bungkus"
-    ]
+        Tuple of unit strings (module constant, shared between calls)
+    """
+    return _UNIT_OPTIONS
 
 
 def truncate_text(text: str, max_length: int = 50, suffix: str = "...") -> str: